@@ -7,30 +7,58 @@ scheduled tasks such as tax collection and salary payments.
 """
 from __future__ import annotations
 
+import asyncio
+import copy
+import hashlib
+import heapq
+import hmac
+import io
 import json
 import os
 import random
+import signal
+import sqlite3
+import stat
 import tempfile
+import time
+import weakref
+from collections import defaultdict, deque
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 import discord
-import pandas as pd
 from discord.ext import commands, tasks
 from dotenv import load_dotenv
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - fall back to the stdlib encoder
+    orjson = None
+
 ###############################################################################
 # Configuration & Constants
 ###############################################################################
 
-DATA_FILE = Path("users.json")
+DATA_FILE = Path("users.db")
+LEGACY_DATA_FILE = Path("users.json")
 SETTINGS_FILE = Path("admin_settings.json")
 PUBLIC_ACCOUNTS_FILE = Path("public_accounts.json")
-TRANSACTIONS_FILE = Path("transactions.json")
+TRANSACTIONS_FILE = Path("transactions.jsonl")
+LEGACY_TRANSACTIONS_FILE = Path("transactions.json")
 ACCOUNT_MAPPING_FILE = Path("account_mapping.json")
 
+STORE_FLUSH_INTERVAL_SECONDS = 5
+TRANSACTION_LOG_COMPACTION_HOURS = 1
+MAX_TRANSACTIONS = 1000
+
+EMBED_DESCRIPTION_LIMIT = 4096
+MEMO_PREVIEW_LENGTH = 100
+
 ADMIN_USER_IDS = {496921375768838154, 559307598848065537}
 
 DEFAULT_SETTINGS: Dict[str, Any] = {
@@ -56,32 +84,455 @@ DEFAULT_SETTINGS: Dict[str, Any] = {
 ###############################################################################
 
 
-class JsonFile:
-    """Simple helper for managing JSON persistence."""
+def encode_json(data: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def decode_json(payload: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+def hash_password(password: str, salt: str) -> str:
+    return hashlib.blake2b(password.encode("utf-8"), salt=bytes.fromhex(salt)).hexdigest()
+
+
+def make_password_record(password: str) -> Dict[str, str]:
+    salt = os.urandom(16).hex()
+    return {"password_salt": salt, "password_hash": hash_password(password, salt)}
+
+
+def _read_umask() -> int:
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+# Read once at import time; os.umask cannot be queried safely from the worker
+# threads that flush the stores.
+NEW_FILE_MODE = 0o666 & ~_read_umask()
+
+
+def write_file_atomic(path: Path, payload: bytes) -> None:
+    """Replace ``path`` with ``payload`` without ever leaving a partial file.
+
+    The replacement keeps the permissions of the existing file, or gets the
+    usual umask-based permissions when the file is new.
+    """
+
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        mode = NEW_FILE_MODE
+    with tempfile.NamedTemporaryFile(
+        "wb", dir=path.parent, prefix=f".{path.name}.", suffix=".tmp", delete=False
+    ) as tmp_file:
+        try:
+            # NamedTemporaryFile always creates the file as 0600.
+            os.chmod(tmp_file.name, mode)
+            tmp_file.write(payload)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+    os.replace(tmp_file.name, path)
+
+
+class CachedStore:
+    """Persistent store that keeps its data in memory and writes it back lazily.
+
+    Every ``load`` returns the same cached object. ``save`` and ``mark_dirty``
+    only flag the store; the data is written back by ``flush`` (see
+    :meth:`BotState.flush`). Subclasses load the initial data and implement
+    ``_take_payload``/``_write``.
+    """
+
+    def __init__(self) -> None:
+        self.dirty = False
+        self._cache: Any = None
+
+    def _set_cache(self, data: Any) -> None:
+        self._cache = data
+
+    def load(self) -> Any:
+        return self._cache
+
+    def save(self, data: Any) -> None:
+        self._set_cache(data)
+        self.dirty = True
+
+    def mark_dirty(self) -> None:
+        self.dirty = True
+
+    def flush(self) -> None:
+        payload = self._take_payload()
+        if payload is not None:
+            self._write(payload)
+
+    async def flush_async(self) -> None:
+        """Flush from the event loop, doing the disk write on a worker thread."""
+
+        payload = self._take_payload()
+        if payload is not None:
+            await asyncio.to_thread(self._write, payload)
+
+    def _take_payload(self) -> Any:
+        # Serialize on the caller's thread so the data is never read while
+        # command handlers are mutating it. Returns None when nothing changed.
+        raise NotImplementedError
+
+    def _write(self, payload: Any) -> None:
+        # Must leave the store dirty again if the write fails.
+        raise NotImplementedError
+
+
+class JsonFile(CachedStore):
+    """Cached store persisted as a single JSON file.
+
+    The file is parsed once when the store is created and rewritten atomically
+    as a whole on every flush.
+    """
 
     def __init__(self, path: Path, default: Any) -> None:
+        super().__init__()
         self.path = path
         self.default = default
         self._ensure_exists()
 
     def _ensure_exists(self) -> None:
-        if not self.path.exists():
-            self.save(self.default)
+        if self.path.exists():
+            self._set_cache(decode_json(self.path.read_bytes()))
+        else:
+            self.save(copy.deepcopy(self.default))
+            self.flush()
 
-    def load(self) -> Any:
-        with self.path.open("r", encoding="utf-8") as file:
-            return json.load(file)
+    def _take_payload(self) -> Optional[bytes]:
+        if not self.dirty:
+            return None
+        self.dirty = False
+        return encode_json(self._cache)
+
+    def _write(self, payload: bytes) -> None:
+        try:
+            write_file_atomic(self.path, payload)
+        except BaseException:
+            self.dirty = True
+            raise
+
+
+class AccountMappingFile(JsonFile):
+    """Account mapping store that also indexes account numbers by user ID."""
+
+    def __init__(self, path: Path, default: Any) -> None:
+        self.user_index: Dict[int, str] = {}
+        super().__init__(path, default)
+
+    def _set_cache(self, data: Any) -> None:
+        super()._set_cache(data)
+        self.user_index = {
+            entry["user_id"]: account_number
+            for account_number, entry in data.items()
+            if entry.get("user_id") is not None
+        }
+
+    def index_user(self, user_id: int, account_number: str) -> None:
+        self.user_index[user_id] = account_number
 
-    def save(self, data: Any) -> None:
-        with self.path.open("w", encoding="utf-8") as file:
-            json.dump(data, file, ensure_ascii=False, indent=4)
 
+class UsersDatabase(CachedStore):
+    """Account store backed by SQLite, one row per account number.
 
-users_store = JsonFile(DATA_FILE, {})
-settings_store = JsonFile(SETTINGS_FILE, DEFAULT_SETTINGS)
-public_accounts_store = JsonFile(PUBLIC_ACCOUNTS_FILE, {})
-transactions_store = JsonFile(TRANSACTIONS_FILE, [])
-account_mapping_store = JsonFile(ACCOUNT_MAPPING_FILE, {})
+    The accounts are cached in memory like the JSON stores, but a flush only
+    writes the rows whose JSON changed since the previous flush, so paying a
+    handful of accounts no longer rewrites every account on disk. A legacy
+    ``users.json`` is imported while the table is still empty.
+
+    The store also keeps a shuffled pool of unused account numbers.
+    """
+
+    def __init__(self, path: Path, legacy_path: Path) -> None:
+        super().__init__()
+        self.path = path
+        self.legacy_path = legacy_path
+        self._free_numbers: Optional[List[str]] = None
+        self._persisted: Dict[str, bytes] = {}
+        # Transactions are managed explicitly so that creating the table and
+        # importing the legacy file either both happen or neither does.
+        self._connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        with self._transaction():
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS users (account_number TEXT PRIMARY KEY, data BLOB NOT NULL)"
+            )
+            rows = self._connection.execute("SELECT account_number, data FROM users").fetchall()
+            if not rows and legacy_path.exists():
+                legacy_users = decode_json(legacy_path.read_bytes())
+                rows = [(account_number, encode_json(data)) for account_number, data in legacy_users.items()]
+                self._connection.executemany("INSERT INTO users (account_number, data) VALUES (?, ?)", rows)
+        self._persisted = {account_number: bytes(data) for account_number, data in rows}
+        self._set_cache({account_number: decode_json(data) for account_number, data in self._persisted.items()})
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self._connection.execute("COMMIT")
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+
+    def _take_payload(self) -> Optional[Dict[str, bytes]]:
+        if not self.dirty:
+            return None
+        self.dirty = False
+        return {account_number: encode_json(data) for account_number, data in self._cache.items()}
+
+    def _write(self, payload: Dict[str, bytes]) -> None:
+        changed = [
+            (account_number, data)
+            for account_number, data in payload.items()
+            if self._persisted.get(account_number) != data
+        ]
+        removed = [(account_number,) for account_number in self._persisted.keys() - payload.keys()]
+        try:
+            with self._transaction():
+                self._connection.executemany(
+                    "INSERT OR REPLACE INTO users (account_number, data) VALUES (?, ?)", changed
+                )
+                self._connection.executemany("DELETE FROM users WHERE account_number = ?", removed)
+        except BaseException:
+            self.dirty = True
+            raise
+        self._persisted = payload
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _set_cache(self, data: Any) -> None:
+        if data is not self._cache:
+            self._free_numbers = None
+        super()._set_cache(data)
+
+    def allocate_account_number(self) -> str:
+        if self._free_numbers is None:
+            free_numbers = [str(number) for number in range(1000, 10000) if str(number) not in self._cache]
+            random.shuffle(free_numbers)
+            self._free_numbers = free_numbers
+        while self._free_numbers:
+            account_number = self._free_numbers.pop()
+            if account_number not in self._cache:
+                return account_number
+        raise RuntimeError("No free account numbers left")
+
+
+class SettingsFile(JsonFile):
+    """Admin settings store with direct accessors for the transfer path."""
+
+    def __init__(self, path: Path, default: Any) -> None:
+        self.transaction_fee: Callable[[int], int] = self._build_fee_calculator({})
+        super().__init__(path, default)
+
+    def _set_cache(self, data: Any) -> None:
+        super()._set_cache(data)
+        self.transaction_fee = self._build_fee_calculator(data.get("transaction_fee", {}))
+
+    @staticmethod
+    def _build_fee_calculator(fee_config: Dict[str, Any]) -> Callable[[int], int]:
+        if not fee_config.get("enabled"):
+            return lambda amount: 0
+        min_amount = fee_config.get("min_amount", 0)
+        fee_rate = fee_config.get("fee_rate", 0.0)
+        return lambda amount: 0 if amount < min_amount else int(amount * fee_rate)
+
+    @property
+    def frozen_accounts(self) -> Dict[str, Any]:
+        return self._cache.get("frozen_accounts", {})
+
+
+class PublicAccountCredentials(NamedTuple):
+    name: str
+    salt: str
+    password_hash: str
+
+
+class PublicAccountsFile(JsonFile):
+    """Public account store that also indexes accounts by account number.
+
+    Passwords are stored as salted BLAKE2b hashes; accounts still holding a
+    plaintext ``password`` are converted when the data is loaded.
+    """
+
+    def __init__(self, path: Path, default: Any) -> None:
+        self.by_account: Dict[str, PublicAccountCredentials] = {}
+        super().__init__(path, default)
+
+    def _set_cache(self, data: Any) -> None:
+        super()._set_cache(data)
+        for account in data.values():
+            password = account.pop("password", None)
+            if password is not None:
+                account.update(make_password_record(password))
+                self.dirty = True
+        self.by_account = {
+            account["account_number"]: PublicAccountCredentials(
+                name, account["password_salt"], account["password_hash"]
+            )
+            for name, account in data.items()
+        }
+
+
+class TransactionLog:
+    """Append-only JSON Lines log of transactions.
+
+    Every transaction is appended to the file as one line as soon as it is
+    recorded. Only the latest ``MAX_TRANSACTIONS`` entries are kept in memory,
+    together with a per-account index of those entries; ``compact`` rewrites
+    the file down to the in-memory entries.
+    """
+
+    def __init__(self, path: Path, legacy_path: Optional[Path] = None) -> None:
+        self.path = path
+        self.by_account: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._transactions: List[Dict[str, Any]] = []
+        self._appended = 0
+
+        if path.exists():
+            transactions, has_bad_lines = self._read_lines()
+            needs_compaction = has_bad_lines or len(transactions) > MAX_TRANSACTIONS
+        else:
+            transactions = []
+            if legacy_path is not None and legacy_path.exists():
+                transactions = decode_json(legacy_path.read_bytes())
+            needs_compaction = True
+
+        for transaction in transactions[-MAX_TRANSACTIONS:]:
+            self._transactions.append(transaction)
+            self._index(transaction)
+
+        self._file = None
+        if needs_compaction:
+            self.compact()
+        else:
+            self._reopen(0)
+
+    def _read_lines(self) -> Tuple[List[Dict[str, Any]], bool]:
+        transactions = []
+        has_bad_lines = False
+        with self.path.open("rb") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    transactions.append(decode_json(line))
+                except ValueError:
+                    # A crash mid-append can leave a truncated final line.
+                    has_bad_lines = True
+        return transactions, has_bad_lines
+
+    def _index(self, transaction: Dict[str, Any]) -> None:
+        for account_number in {transaction["from_user"], transaction["to_user"]}:
+            account_transactions = self.by_account.get(account_number)
+            if account_transactions is None:
+                account_transactions = self.by_account[account_number] = deque()
+            account_transactions.append(transaction)
+
+    def load(self) -> List[Dict[str, Any]]:
+        return self._transactions
+
+    def extend(self, new_transactions: List[Dict[str, Any]]) -> None:
+        if not new_transactions:
+            return
+        self._file.write(b"".join(encode_json(transaction) + b"\n" for transaction in new_transactions))
+        self._appended += len(new_transactions)
+
+        transactions = self._transactions
+        for transaction in new_transactions:
+            transactions.append(transaction)
+            self._index(transaction)
+        overflow = len(transactions) - MAX_TRANSACTIONS
+        if overflow > 0:
+            for dropped in transactions[:overflow]:
+                for account_number in {dropped["from_user"], dropped["to_user"]}:
+                    account_transactions = self.by_account[account_number]
+                    account_transactions.popleft()
+                    if not account_transactions:
+                        del self.by_account[account_number]
+            del transactions[:overflow]
+
+    def for_account(self, account_number: str) -> Deque[Dict[str, Any]]:
+        """Return the retained transactions involving ``account_number``, oldest first."""
+
+        return self.by_account.get(account_number, deque())
+
+    def compact(self) -> None:
+        write_file_atomic(self.path, self._serialize())
+        self._reopen(0)
+
+    async def compact_async(self) -> None:
+        """Compact from the event loop, doing the rewrite on a worker thread."""
+
+        appended_before = self._appended
+        payload = self._serialize()
+        await asyncio.to_thread(write_file_atomic, self.path, payload)
+        # Entries appended while the rewrite ran went to the replaced file.
+        self._reopen(self._appended - appended_before)
+
+    def _serialize(self) -> bytes:
+        return b"".join(encode_json(transaction) + b"\n" for transaction in self._transactions)
+
+    def _reopen(self, carry_over: int) -> None:
+        if self._file is not None:
+            self._file.close()
+        self._file = self.path.open("ab", buffering=0)
+        if carry_over:
+            self._file.write(
+                b"".join(encode_json(transaction) + b"\n" for transaction in self._transactions[-carry_over:])
+            )
+
+
+@dataclass
+class BotState:
+    """Every persistent store the bot works with, loaded once at startup."""
+
+    users: UsersDatabase
+    settings: SettingsFile
+    public_accounts: PublicAccountsFile
+    account_mapping: AccountMappingFile
+    transactions: TransactionLog
+
+    @property
+    def cached_stores(self) -> Tuple[CachedStore, ...]:
+        return (self.users, self.settings, self.public_accounts, self.account_mapping)
+
+    def flush(self) -> None:
+        for store in self.cached_stores:
+            try:
+                store.flush()
+            except (OSError, sqlite3.Error) as error:
+                print(f"저장 실패 ({store.path}): {error}")
+
+    async def flush_async(self) -> None:
+        # A failing store stays dirty and is retried on the next flush; it must
+        # not stop the other stores (or the flush task) from being written.
+        for store in self.cached_stores:
+            try:
+                await store.flush_async()
+            except (OSError, sqlite3.Error) as error:
+                print(f"저장 실패 ({store.path}): {error}")
+
+
+state = BotState(
+    users=UsersDatabase(DATA_FILE, LEGACY_DATA_FILE),
+    settings=SettingsFile(SETTINGS_FILE, DEFAULT_SETTINGS),
+    public_accounts=PublicAccountsFile(PUBLIC_ACCOUNTS_FILE, {}),
+    account_mapping=AccountMappingFile(ACCOUNT_MAPPING_FILE, {}),
+    transactions=TransactionLog(TRANSACTIONS_FILE, LEGACY_TRANSACTIONS_FILE),
+)
 
 
 ###############################################################################
@@ -98,15 +549,10 @@ class AccountRecord:
 
     @classmethod
     def from_dict(cls, account_number: str, data: Dict[str, Any]) -> "AccountRecord":
-        balance = data.get("잔액")
-        if balance is None:
-            cash = data.pop("현금", 0)
-            bank = data.pop("은행", 0)
-            balance = cash + bank
         return cls(
             account_number=account_number,
             owner_name=data.get("이름", "알 수 없음"),
-            balance=balance,
+            balance=data.get("잔액", 0),
             is_public=data.get("공용계좌", False),
         )
 
@@ -127,43 +573,72 @@ class AccountRecord:
 
 
 def load_users() -> Dict[str, Dict[str, Any]]:
-    return users_store.load()
+    return state.users.load()
 
 
 def save_users(users: Dict[str, Dict[str, Any]]) -> None:
-    users_store.save(users)
+    state.users.save(users)
 
 
 def load_settings() -> Dict[str, Any]:
-    return settings_store.load()
+    return state.settings.load()
 
 
 def save_settings(settings: Dict[str, Any]) -> None:
-    settings_store.save(settings)
+    state.settings.save(settings)
 
 
 def load_public_accounts() -> Dict[str, Dict[str, Any]]:
-    return public_accounts_store.load()
+    return state.public_accounts.load()
 
 
 def save_public_accounts(data: Dict[str, Dict[str, Any]]) -> None:
-    public_accounts_store.save(data)
+    state.public_accounts.save(data)
 
 
 def load_transactions() -> List[Dict[str, Any]]:
-    return transactions_store.load()
+    return state.transactions.load()
 
 
-def save_transactions(data: List[Dict[str, Any]]) -> None:
-    transactions_store.save(data)
+def load_account_mapping() -> Dict[str, Dict[str, Any]]:
+    return state.account_mapping.load()
 
 
-def load_account_mapping() -> Dict[str, Dict[str, Any]]:
-    return account_mapping_store.load()
+@lru_cache(maxsize=1)
+def iso_timestamp_for_second(second: int) -> str:
+    return datetime.fromtimestamp(second).isoformat(timespec="seconds")
+
 
+def now_iso() -> str:
+    """Current local time as a seconds-resolution ISO string, reused within the same second."""
 
-def save_account_mapping(mapping: Dict[str, Dict[str, Any]]) -> None:
-    account_mapping_store.save(mapping)
+    return iso_timestamp_for_second(int(time.time()))
+
+
+@lru_cache(maxsize=4096)
+def format_timestamp(timestamp: str, fmt: str) -> str:
+    """Reformat a stored ISO timestamp, caching results since log entries share timestamps."""
+
+    return datetime.fromisoformat(timestamp).strftime(fmt)
+
+
+def build_transaction(
+    transaction_type: str,
+    from_user: str,
+    to_user: str,
+    amount: int,
+    fee: int = 0,
+    memo: str = "",
+) -> Dict[str, Any]:
+    return {
+        "timestamp": now_iso(),
+        "type": transaction_type,
+        "from_user": from_user,
+        "to_user": to_user,
+        "amount": amount,
+        "fee": fee,
+        "memo": memo,
+    }
 
 
 def add_transaction(
@@ -174,20 +649,13 @@ def add_transaction(
     fee: int = 0,
     memo: str = "",
 ) -> None:
-    transactions = load_transactions()
-    transactions.append(
-        {
-            "timestamp": datetime.now().isoformat(),
-            "type": transaction_type,
-            "from_user": from_user,
-            "to_user": to_user,
-            "amount": amount,
-            "fee": fee,
-            "memo": memo,
-        }
-    )
-    transactions = transactions[-1000:]
-    save_transactions(transactions)
+    state.transactions.extend([build_transaction(transaction_type, from_user, to_user, amount, fee, memo)])
+
+
+def add_transactions(transactions: List[Dict[str, Any]]) -> None:
+    """Record several transactions built with :func:`build_transaction` in one log write."""
+
+    state.transactions.extend(transactions)
 
 
 ###############################################################################
@@ -195,52 +663,64 @@ def add_transaction(
 ###############################################################################
 
 
-def format_number_4digit(value: int) -> str:
-    return f"{value:,}"
-
+def migrate_legacy_accounts() -> None:
+    """Merge the legacy cash/bank fields of old users.json records into a single balance."""
 
-def generate_account_number() -> str:
     users = load_users()
-    mapping = load_account_mapping()
-    public_accounts = load_public_accounts()
+    migrated = False
+    for data in users.values():
+        if "잔액" not in data:
+            data["잔액"] = data.pop("현금", 0) + data.pop("은행", 0)
+            migrated = True
+    if migrated:
+        state.users.mark_dirty()
 
-    existing_numbers = set(users.keys()) | set(mapping.keys())
-    existing_numbers.update(account["account_number"] for account in public_accounts.values())
 
+def migrate_salary_source_password() -> None:
+    """Replace a plaintext salary source password in the settings with its hash."""
+
+    settings = load_settings()
+    source_info = settings.get("salary_system", {}).get("source_account", {})
+    if "password" not in source_info:
+        return
+    password = source_info.pop("password")
+    if verify_public_account(source_info.get("account_number", ""), password):
+        source_info["password_hash"] = state.public_accounts.by_account[source_info["account_number"]].password_hash
+    state.settings.mark_dirty()
+
+
+@lru_cache(maxsize=4096)
+def format_won(value: int) -> str:
+    return f"{value:,}원"
+
+
+def generate_account_number() -> str:
+    mapping = load_account_mapping()
     while True:
-        account_number = f"{random.randint(1000, 9999)}"
-        if account_number not in existing_numbers:
+        account_number = state.users.allocate_account_number()
+        if account_number not in mapping and account_number not in state.public_accounts.by_account:
             return account_number
 
 
 def get_account_number_by_user(user_id: int) -> Optional[str]:
-    mapping = load_account_mapping()
-    for account_number, data in mapping.items():
-        if data.get("user_id") == user_id:
-            return account_number
-    return None
+    return state.account_mapping.user_index.get(user_id)
 
 
 def ensure_account_record(account_number: str) -> AccountRecord:
     users = load_users()
     if account_number not in users:
         raise ValueError("Account not found")
-    record = AccountRecord.from_dict(account_number, users[account_number])
-    users[account_number] = record.to_dict()
-    save_users(users)
-    return record
+    return AccountRecord.from_dict(account_number, users[account_number])
 
 
 def update_account_record(record: AccountRecord) -> None:
     users = load_users()
     users[record.account_number] = record.to_dict()
-    save_users(users)
+    state.users.mark_dirty()
 
 
 def is_account_frozen(account_number: str) -> bool:
-    settings = load_settings()
-    frozen_accounts = settings.get("frozen_accounts", {})
-    return account_number in frozen_accounts
+    return account_number in state.settings.frozen_accounts
 
 
 def set_account_frozen(account_number: str, frozen: bool, reason: str = "") -> None:
@@ -253,25 +733,33 @@ def set_account_frozen(account_number: str, frozen: bool, reason: str = "") -> N
         }
     else:
         frozen_accounts.pop(account_number, None)
-    save_settings(settings)
+    state.settings.mark_dirty()
 
 
 def verify_public_account(account_number: str, password: str) -> Optional[str]:
-    public_accounts = load_public_accounts()
-    for name, data in public_accounts.items():
-        if data["account_number"] == account_number and data["password"] == password:
-            return name
+    account = state.public_accounts.by_account.get(account_number)
+    if account is None:
+        return None
+    if hmac.compare_digest(hash_password(password, account.salt), account.password_hash):
+        return account.name
     return None
 
 
+def verify_salary_source(source_info: Dict[str, Any]) -> bool:
+    """Check that the salary source still matches its public account's password.
+
+    The salary settings keep the password hash that was current when the source
+    was configured, so changing the account's password revokes salary payouts.
+    """
+
+    account = state.public_accounts.by_account.get(source_info.get("account_number", ""))
+    if account is None:
+        return False
+    return hmac.compare_digest(source_info.get("password_hash", ""), account.password_hash)
+
+
 def calculate_transaction_fee(amount: int) -> int:
-    settings = load_settings()
-    fee_config = settings.get("transaction_fee", {})
-    if not fee_config.get("enabled"):
-        return 0
-    if amount < fee_config.get("min_amount", 0):
-        return 0
-    return int(amount * fee_config.get("fee_rate", 0.0))
+    return state.settings.transaction_fee(amount)
 
 
 def perform_transfer(
@@ -282,32 +770,57 @@ def perform_transfer(
     memo: str = "",
     apply_fee: bool = True,
     transaction_type: str = "송금",
-) -> Tuple[int, AccountRecord, AccountRecord]:
+) -> int:
     if amount <= 0:
         raise ValueError("Transfer amount must be positive")
 
-    sender = ensure_account_record(sender_account)
-    recipient = ensure_account_record(recipient_account)
+    users = load_users()
+    sender = users.get(sender_account)
+    recipient = users.get(recipient_account)
+    if sender is None or recipient is None:
+        raise ValueError("Account not found")
 
-    if is_account_frozen(sender.account_number):
+    if is_account_frozen(sender_account):
         raise PermissionError("Sender account is frozen")
-    if is_account_frozen(recipient.account_number):
+    if is_account_frozen(recipient_account):
         raise PermissionError("Recipient account is frozen")
 
     fee = calculate_transaction_fee(amount) if apply_fee else 0
     total_cost = amount + fee
 
-    if sender.balance < total_cost:
+    if sender["잔액"] < total_cost:
         raise RuntimeError("Insufficient funds")
 
-    sender.balance -= total_cost
-    recipient.balance += amount
+    sender["잔액"] -= total_cost
+    recipient["잔액"] += amount
+    save_users(users)
+
+    add_transaction(transaction_type, sender_account, recipient_account, amount, fee, memo)
+    return fee
+
 
-    update_account_record(sender)
-    update_account_record(recipient)
+account_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
 
-    add_transaction(transaction_type, sender.account_number, recipient.account_number, amount, fee, memo)
-    return fee, sender, recipient
+
+@asynccontextmanager
+async def lock_accounts(*account_numbers: str) -> AsyncIterator[None]:
+    """Hold the locks of the given accounts, acquired in sorted order to avoid deadlocks."""
+
+    locks = []
+    for account_number in sorted(set(account_numbers)):
+        lock = account_locks.get(account_number)
+        if lock is None:
+            lock = account_locks[account_number] = asyncio.Lock()
+        locks.append(lock)
+    async with AsyncExitStack() as stack:
+        for lock in locks:
+            await stack.enter_async_context(lock)
+        yield
+
+
+async def perform_transfer_locked(sender_account: str, recipient_account: str, amount: int, **kwargs: Any) -> int:
+    async with lock_accounts(sender_account, recipient_account):
+        return perform_transfer(sender_account, recipient_account, amount, **kwargs)
 
 
 def require_admin(user_id: int) -> bool:
@@ -337,13 +850,43 @@ def build_account_embed(record: AccountRecord, *, title: str, include_status: bo
     embed = discord.Embed(title=title, color=0x0099FF)
     embed.add_field(name="계좌번호", value=f"`{record.account_number}`", inline=False)
     embed.add_field(name="예금주", value=record.owner_name, inline=False)
-    embed.add_field(name="잔액", value=f"{format_number_4digit(record.balance)}원", inline=False)
+    embed.add_field(name="잔액", value=format_won(record.balance), inline=False)
     if include_status:
         status = "🔒 동결됨" if is_account_frozen(record.account_number) else "✅ 정상"
         embed.add_field(name="계좌 상태", value=status, inline=False)
     return embed
 
 
+def describe_transaction(transaction: Dict[str, Any], account_number: str) -> str:
+    timestamp = format_timestamp(transaction["timestamp"], "%m/%d %H:%M")
+    if transaction["from_user"] == account_number:
+        desc = f"**{timestamp}** ↗️ {transaction['type']} -{format_won(transaction['amount'])}"
+        if transaction["fee"]:
+            desc += f" (수수료: {format_won(transaction['fee'])})"
+    else:
+        desc = f"**{timestamp}** ↘️ {transaction['type']} +{format_won(transaction['amount'])}"
+    memo = transaction.get("memo")
+    if memo:
+        if len(memo) > MEMO_PREVIEW_LENGTH:
+            memo = memo[: MEMO_PREVIEW_LENGTH - 1] + "…"
+        desc += f"\n메모: {memo}"
+    return desc
+
+
+def describe_transactions(transactions: List[Dict[str, Any]], account_number: str) -> str:
+    """Join transaction rows into an embed description, stopping before Discord's length limit."""
+
+    rows: List[str] = []
+    length = 0
+    for transaction in transactions:
+        row = describe_transaction(transaction, account_number)
+        length += len(row) + (2 if rows else 0)
+        if length > EMBED_DESCRIPTION_LIMIT:
+            break
+        rows.append(row)
+    return "\n\n".join(rows)
+
+
 ###############################################################################
 # Slash commands - general user utilities
 ###############################################################################
@@ -368,7 +911,11 @@ async def cmd_create_account(interaction: discord.Interaction) -> None:
         await interaction.response.send_message("이미 계좌가 존재합니다. `/잔액` 명령어로 확인하세요.", ephemeral=True)
         return
 
-    account_number = generate_account_number()
+    try:
+        account_number = generate_account_number()
+    except RuntimeError:
+        await interaction.response.send_message("발급 가능한 계좌번호가 없습니다. 관리자에게 문의하세요.", ephemeral=True)
+        return
     record = AccountRecord(account_number=account_number, owner_name=interaction.user.display_name, balance=1_000_000)
 
     users = load_users()
@@ -381,7 +928,8 @@ async def cmd_create_account(interaction: discord.Interaction) -> None:
         "discord_name": interaction.user.display_name,
         "created_at": datetime.now().isoformat(),
     }
-    save_account_mapping(mapping)
+    state.account_mapping.index_user(interaction.user.id, account_number)
+    state.account_mapping.mark_dirty()
 
     add_transaction("계좌생성", "SYSTEM", account_number, 1_000_000, 0, "신규 계좌 생성")
 
@@ -413,7 +961,7 @@ async def cmd_transfer(interaction: discord.Interaction, 계좌번호: str, 금
         return
 
     try:
-        fee, _, _ = perform_transfer(
+        fee = await perform_transfer_locked(
             sender_account,
             계좌번호,
             금액,
@@ -431,8 +979,8 @@ async def cmd_transfer(interaction: discord.Interaction, 계좌번호: str, 금
         total_cost = 금액 + fee_amount
         if fee_amount:
             message = (
-                f"송금 실패: 잔액 부족 (송금액: {format_number_4digit(금액)}원 + 수수료: {format_number_4digit(fee_amount)}원 = "
-                f"총 {format_number_4digit(total_cost)}원이 필요합니다.)"
+                f"송금 실패: 잔액 부족 (송금액: {format_won(금액)} + 수수료: {format_won(fee_amount)} = "
+                f"총 {format_won(total_cost)}이 필요합니다.)"
             )
         else:
             message = "송금 실패: 잔액이 부족합니다."
@@ -442,9 +990,9 @@ async def cmd_transfer(interaction: discord.Interaction, 계좌번호: str, 금
         await interaction.response.send_message("송금 처리 중 오류가 발생했습니다. 관리자에게 문의하세요.", ephemeral=True)
         return
 
-    description = [f"💸 **{format_number_4digit(금액)}원 송금 완료!**", f"대상 계좌: `{계좌번호}`"]
+    description = [f"💸 **{format_won(금액)} 송금 완료!**", f"대상 계좌: `{계좌번호}`"]
     if fee:
-        description.append(f"수수료: {format_number_4digit(fee)}원")
+        description.append(f"수수료: {format_won(fee)}")
     await interaction.response.send_message("\n".join(description))
 
 
@@ -455,26 +1003,14 @@ async def cmd_transactions(interaction: discord.Interaction) -> None:
         await interaction.response.send_message("계좌가 없습니다. `/계좌생성` 명령어로 먼저 계좌를 만드세요.", ephemeral=True)
         return
 
-    transactions = load_transactions()
-    user_transactions = [t for t in transactions if t["from_user"] == account_number or t["to_user"] == account_number][-10:]
+    user_transactions = list(islice(reversed(state.transactions.for_account(account_number)), 10))
 
     if not user_transactions:
         await interaction.response.send_message("거래내역이 없습니다.", ephemeral=True)
         return
 
     embed = discord.Embed(title="최근 거래내역 (10건)", color=0x0099FF)
-    for transaction in reversed(user_transactions):
-        timestamp = datetime.fromisoformat(transaction["timestamp"]).strftime("%m/%d %H:%M")
-        if transaction["from_user"] == account_number:
-            desc = f"↗️ {transaction['type']} -{format_number_4digit(transaction['amount'])}원"
-            if transaction["fee"]:
-                desc += f" (수수료: {format_number_4digit(transaction['fee'])}원)"
-        else:
-            desc = f"↘️ {transaction['type']} +{format_number_4digit(transaction['amount'])}원"
-        if transaction.get("memo"):
-            desc += f"\n메모: {transaction['memo']}"
-        embed.add_field(name=timestamp, value=desc, inline=False)
-
+    embed.description = describe_transactions(user_transactions, account_number)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
@@ -564,14 +1100,15 @@ async def cmd_mint_currency(
         await interaction.response.send_message("계좌를 찾을 수 없습니다.", ephemeral=True)
         return
 
-    record = ensure_account_record(account_number)
     if is_account_frozen(account_number):
         await interaction.response.send_message("계좌가 동결되어 있습니다.", ephemeral=True)
         return
 
-    previous_balance = record.balance
-    record.balance += 금액
-    update_account_record(record)
+    async with lock_accounts(account_number):
+        record = ensure_account_record(account_number)
+        previous_balance = record.balance
+        record.balance += 금액
+        update_account_record(record)
 
     add_transaction(
         "관리자화폐발행",
@@ -585,9 +1122,9 @@ async def cmd_mint_currency(
     embed = discord.Embed(title="💰 화폐 발행 완료", color=0x00FF00)
     embed.add_field(name="대상 계좌", value=f"`{account_number}`", inline=False)
     embed.add_field(name="대상자", value=대상자.display_name, inline=False)
-    embed.add_field(name="발행 금액", value=f"{format_number_4digit(금액)}원", inline=True)
-    embed.add_field(name="이전 잔액", value=f"{format_number_4digit(previous_balance)}원", inline=True)
-    embed.add_field(name="현재 잔액", value=f"{format_number_4digit(record.balance)}원", inline=True)
+    embed.add_field(name="발행 금액", value=format_won(금액), inline=True)
+    embed.add_field(name="이전 잔액", value=format_won(previous_balance), inline=True)
+    embed.add_field(name="현재 잔액", value=format_won(record.balance), inline=True)
     embed.add_field(name="발행 사유", value=사유, inline=False)
     embed.add_field(name="처리 관리자", value=interaction.user.display_name, inline=False)
     await interaction.response.send_message(embed=embed, ephemeral=True)
@@ -614,7 +1151,7 @@ async def cmd_set_transaction_fee(
     save_settings(settings)
 
     embed = discord.Embed(title="거래세 설정 완료!", color=0x0099FF)
-    embed.add_field(name="최소 거래 금액", value=f"{format_number_4digit(최소금액)}원", inline=False)
+    embed.add_field(name="최소 거래 금액", value=format_won(최소금액), inline=False)
     embed.add_field(name="수수료율", value=f"{수수료율}%", inline=False)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -644,7 +1181,7 @@ async def cmd_create_public_account(
 
     public_accounts[계좌이름] = {
         "account_number": 계좌번호,
-        "password": 계좌비밀번호,
+        **make_password_record(계좌비밀번호),
         "created_by": interaction.user.id,
         "created_at": datetime.now().isoformat(),
     }
@@ -675,8 +1212,7 @@ async def cmd_access_public_account(interaction: discord.Interaction, 계좌이
     account = public_accounts[계좌이름]
     embed = discord.Embed(title=f"🏛️ 공용계좌: {계좌이름}", color=0x0099FF)
     embed.add_field(name="계좌번호", value=f"`{account['account_number']}`", inline=False)
-    embed.add_field(name="비밀번호", value=f"`{account['password']}`", inline=False)
-    embed.set_footer(text="이 정보로 공용계좌 거래를 할 수 있습니다.")
+    embed.set_footer(text="비밀번호는 암호화되어 저장되므로 조회할 수 없습니다.")
 
     try:
         await interaction.user.send(embed=embed)
@@ -722,7 +1258,7 @@ async def cmd_public_transfer(
         return
 
     try:
-        fee, _, _ = perform_transfer(
+        fee = await perform_transfer_locked(
             공용계좌번호,
             받는계좌번호,
             금액,
@@ -740,8 +1276,8 @@ async def cmd_public_transfer(
         total_cost = 금액 + fee_amount
         if fee_amount:
             message = (
-                f"송금 실패: 잔액 부족 (송금액: {format_number_4digit(금액)}원 + 수수료: {format_number_4digit(fee_amount)}원 = "
-                f"총 {format_number_4digit(total_cost)}원이 필요합니다.)"
+                f"송금 실패: 잔액 부족 (송금액: {format_won(금액)} + 수수료: {format_won(fee_amount)} = "
+                f"총 {format_won(total_cost)}이 필요합니다.)"
             )
         else:
             message = "송금 실패: 잔액이 부족합니다."
@@ -751,9 +1287,9 @@ async def cmd_public_transfer(
     embed = discord.Embed(title="💸 공용계좌 송금 완료", color=0x00FF00)
     embed.add_field(name="보내는 계좌", value=f"{account_name} (`{공용계좌번호}`)", inline=False)
     embed.add_field(name="받는 계좌", value=f"`{받는계좌번호}`", inline=False)
-    embed.add_field(name="송금액", value=f"{format_number_4digit(금액)}원", inline=True)
+    embed.add_field(name="송금액", value=format_won(금액), inline=True)
     if fee:
-        embed.add_field(name="수수료", value=f"{format_number_4digit(fee)}원", inline=True)
+        embed.add_field(name="수수료", value=format_won(fee), inline=True)
     await interaction.response.send_message(embed=embed)
 
 
@@ -779,7 +1315,7 @@ async def cmd_public_deposit(
         return
 
     try:
-        fee, _, _ = perform_transfer(
+        fee = await perform_transfer_locked(
             sender_account,
             공용계좌번호,
             금액,
@@ -797,8 +1333,8 @@ async def cmd_public_deposit(
         total_cost = 금액 + fee_amount
         if fee_amount:
             message = (
-                f"입금 실패: 잔액 부족 (입금액: {format_number_4digit(금액)}원 + 수수료: {format_number_4digit(fee_amount)}원 = "
-                f"총 {format_number_4digit(total_cost)}원이 필요합니다.)"
+                f"입금 실패: 잔액 부족 (입금액: {format_won(금액)} + 수수료: {format_won(fee_amount)} = "
+                f"총 {format_won(total_cost)}이 필요합니다.)"
             )
         else:
             message = "입금 실패: 잔액이 부족합니다."
@@ -808,9 +1344,9 @@ async def cmd_public_deposit(
     embed = discord.Embed(title="💰 공용계좌 입금 완료", color=0x00FF00)
     embed.add_field(name="보내는 계좌", value=f"`{sender_account}`", inline=False)
     embed.add_field(name="받는 계좌", value=f"{account_name} (`{공용계좌번호}`)", inline=False)
-    embed.add_field(name="입금액", value=f"{format_number_4digit(금액)}원", inline=True)
+    embed.add_field(name="입금액", value=format_won(금액), inline=True)
     if fee:
-        embed.add_field(name="수수료", value=f"{format_number_4digit(fee)}원", inline=True)
+        embed.add_field(name="수수료", value=format_won(fee), inline=True)
     await interaction.response.send_message(embed=embed)
 
 
@@ -892,14 +1428,14 @@ async def cmd_set_salary(
     salary_config.setdefault("salaries", {})[str(role_id)] = 월급
     salary_config["source_account"] = {
         "account_number": 공용계좌번호,
-        "password": 공용계좌비밀번호,
+        "password_hash": state.public_accounts.by_account[공용계좌번호].password_hash,
         "account_name": account_name,
     }
     save_settings(settings)
 
     embed = discord.Embed(title="💰 월급 설정 완료", color=0x00FF00)
     embed.add_field(name="역할", value=role.name, inline=True)
-    embed.add_field(name="월급", value=f"{format_number_4digit(월급)}원", inline=True)
+    embed.add_field(name="월급", value=format_won(월급), inline=True)
     embed.add_field(name="월급 지급원", value=f"{account_name} (`{공용계좌번호}`)", inline=False)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -915,26 +1451,14 @@ async def cmd_admin_transactions(interaction: discord.Interaction, 대상자: di
         await interaction.response.send_message("계좌를 찾을 수 없습니다.", ephemeral=True)
         return
 
-    transactions = load_transactions()
-    user_transactions = [t for t in transactions if t["from_user"] == account_number or t["to_user"] == account_number][-15:]
+    user_transactions = list(islice(reversed(state.transactions.for_account(account_number)), 15))
 
     if not user_transactions:
         await interaction.response.send_message("거래내역이 없습니다.", ephemeral=True)
         return
 
     embed = discord.Embed(title=f"📊 {account_number}의 거래내역 (15건)", color=0xFF9900)
-    for transaction in reversed(user_transactions):
-        timestamp = datetime.fromisoformat(transaction["timestamp"]).strftime("%m/%d %H:%M")
-        if transaction["from_user"] == account_number:
-            desc = f"↗️ {transaction['type']} -{format_number_4digit(transaction['amount'])}원"
-            if transaction["fee"]:
-                desc += f" (수수료: {format_number_4digit(transaction['fee'])}원)"
-        else:
-            desc = f"↘️ {transaction['type']} +{format_number_4digit(transaction['amount'])}원"
-        if transaction.get("memo"):
-            desc += f"\n메모: {transaction['memo']}"
-        embed.add_field(name=timestamp, value=desc, inline=False)
-
+    embed.description = describe_transactions(user_transactions, account_number)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
@@ -949,16 +1473,17 @@ async def cmd_reset_account(interaction: discord.Interaction, 대상자: discord
         await interaction.response.send_message("계좌를 찾을 수 없습니다.", ephemeral=True)
         return
 
-    record = ensure_account_record(account_number)
-    previous_balance = record.balance
-    record.balance = 1_000_000
-    update_account_record(record)
+    async with lock_accounts(account_number):
+        record = ensure_account_record(account_number)
+        previous_balance = record.balance
+        record.balance = 1_000_000
+        update_account_record(record)
 
     add_transaction("관리자초기화", "SYSTEM", account_number, 1_000_000, 0, f"관리자 계좌 초기화: {interaction.user.display_name}")
 
     embed = discord.Embed(title="🔄 계좌 초기화 완료", color=0x00FF00)
     embed.add_field(name="대상 계좌", value=f"`{account_number}`", inline=False)
-    embed.add_field(name="이전 잔액", value=f"{format_number_4digit(previous_balance)}원", inline=True)
+    embed.add_field(name="이전 잔액", value=format_won(previous_balance), inline=True)
     embed.add_field(name="현재 잔액", value="1,000,000원", inline=True)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -974,56 +1499,59 @@ async def cmd_account_overview(interaction: discord.Interaction) -> None:
         await interaction.response.send_message("개설된 계좌가 없습니다.", ephemeral=True)
         return
 
-    records = [AccountRecord.from_dict(acc, data) for acc, data in users.items()]
-    total_money = sum(record.balance for record in records)
-    records.sort(key=lambda record: record.balance, reverse=True)
+    total_money = sum(data["잔액"] for data in users.values())
+    top_accounts = heapq.nlargest(10, users.items(), key=lambda item: item[1]["잔액"])
 
     embed = discord.Embed(title="🏦 전체 계좌 현황", color=0x0099FF)
-    embed.add_field(name="총 계좌 수", value=f"{len(records)}개", inline=True)
-    embed.add_field(name="총 유통 자금", value=f"{format_number_4digit(total_money)}원", inline=True)
-    embed.add_field(name="평균 잔액", value=f"{format_number_4digit(total_money // len(records))}원", inline=True)
+    embed.add_field(name="총 계좌 수", value=f"{len(users)}개", inline=True)
+    embed.add_field(name="총 유통 자금", value=format_won(total_money), inline=True)
+    embed.add_field(name="평균 잔액", value=format_won(total_money // len(users)), inline=True)
 
     details = []
-    for idx, record in enumerate(records[:10], start=1):
-        status = "🔒" if is_account_frozen(record.account_number) else "✅"
-        details.append(f"{idx}. {status} `{record.account_number}` - {format_number_4digit(record.balance)}원")
+    for idx, (account_number, data) in enumerate(top_accounts, start=1):
+        status = "🔒" if is_account_frozen(account_number) else "✅"
+        details.append(f"{idx}. {status} `{account_number}` - {format_won(data['잔액'])}")
 
-    if len(records) > 10:
-        details.append(f"... 외 {len(records) - 10}개 계좌")
+    if len(users) > 10:
+        details.append(f"... 외 {len(users) - 10}개 계좌")
 
     embed.add_field(name="상위 계좌 (잔액순)", value="\n".join(details), inline=False)
     await interaction.response.send_message(embed=embed, ephemeral=True)
 
 
-def create_excel_transactions(target_account: Optional[str] = None) -> Optional[str]:
-    transactions = load_transactions()
-    if target_account:
-        filtered = [t for t in transactions if t["from_user"] == target_account or t["to_user"] == target_account]
-    else:
-        filtered = transactions
+def create_excel_transactions(transactions: List[Dict[str, Any]]) -> Optional[io.BytesIO]:
+    """Write ``transactions`` to an in-memory .xlsx file, rewound for reading.
 
-    if not filtered:
+    This does no bot state access, so it can run on a worker thread as long as
+    the caller passes a snapshot of the transactions.
+    """
+
+    if not transactions:
         return None
 
-    rows = []
-    for transaction in filtered:
-        timestamp = datetime.fromisoformat(transaction["timestamp"])
-        rows.append(
-            {
-                "거래일시": timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                "거래유형": transaction["type"],
-                "보내는계좌": transaction["from_user"],
-                "받는계좌": transaction["to_user"],
-                "금액": transaction["amount"],
-                "수수료": transaction["fee"],
-                "메모": transaction["memo"],
-            }
+    # openpyxl is only needed for exports, so load it on first use.
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("거래내역")
+    sheet.append(["거래일시", "거래유형", "보내는계좌", "받는계좌", "금액", "수수료", "메모"])
+    for transaction in transactions:
+        sheet.append(
+            [
+                format_timestamp(transaction["timestamp"], "%Y-%m-%d %H:%M:%S"),
+                transaction["type"],
+                transaction["from_user"],
+                transaction["to_user"],
+                transaction["amount"],
+                transaction["fee"],
+                transaction["memo"],
+            ]
         )
 
-    df = pd.DataFrame(rows)
-    with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as tmp_file:
-        df.to_excel(tmp_file.name, index=False, engine="openpyxl")
-        return tmp_file.name
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
 
 
 @bot.tree.command(name="엑셀내보내기", description="[관리자 전용] 거래내역을 엑셀로 내보냅니다")
@@ -1041,8 +1569,14 @@ async def cmd_export_transactions(interaction: discord.Interaction, 대상자: O
             await interaction.followup.send("계좌를 찾을 수 없습니다.", ephemeral=True)
             return
 
-    excel_path = create_excel_transactions(target_account)
-    if not excel_path:
+    if target_account:
+        transactions = list(state.transactions.for_account(target_account))
+    else:
+        transactions = list(load_transactions())
+
+    # Building the workbook is the slow part; keep it off the event loop.
+    excel_file = await asyncio.to_thread(create_excel_transactions, transactions)
+    if excel_file is None:
         await interaction.followup.send("내보낼 거래내역이 없습니다.", ephemeral=True)
         return
 
@@ -1059,10 +1593,7 @@ async def cmd_export_transactions(interaction: discord.Interaction, 대상자: O
     embed.add_field(name="파일명", value=filename, inline=False)
     embed.add_field(name="생성시간", value=datetime.now().strftime("%Y-%m-%d %H:%M:%S"), inline=False)
 
-    with open(excel_path, "rb") as file:
-        await interaction.followup.send(embed=embed, file=discord.File(file, filename=filename), ephemeral=True)
-
-    os.unlink(excel_path)
+    await interaction.followup.send(embed=embed, file=discord.File(excel_file, filename=filename), ephemeral=True)
 
 
 ###############################################################################
@@ -1089,22 +1620,21 @@ def collect_tax_from_accounts() -> None:
     tax_rate = tax_config.get("rate", 0.0)
     total_collected = 0
 
-    for account_number, data in users.items():
-        record = AccountRecord.from_dict(account_number, data)
-        if record.balance <= 0 or record.is_public:
+    for data in users.values():
+        balance = data["잔액"]
+        if balance <= 0 or data.get("공용계좌"):
             continue
-        tax_amount = int(record.balance * tax_rate)
+        tax_amount = int(balance * tax_rate)
         if tax_amount <= 0:
             continue
-        record.balance = max(0, record.balance - tax_amount)
-        users[account_number] = record.to_dict()
+        data["잔액"] = max(0, balance - tax_amount)
         total_collected += tax_amount
 
     if total_collected > 0:
         save_users(users)
         settings["tax_system"]["last_collected"] = datetime.now().isoformat()
         save_settings(settings)
-        print(f"세금 일괄 징수 완료: 총 {format_number_4digit(total_collected)}원")
+        print(f"세금 일괄 징수 완료: 총 {format_won(total_collected)}")
 
 
 def pay_monthly_salaries_to_members() -> None:
@@ -1122,14 +1652,13 @@ def pay_monthly_salaries_to_members() -> None:
 
     source_info = salary_config.get("source_account", {})
     source_account = source_info.get("account_number")
-    source_password = source_info.get("password")
     source_name = source_info.get("account_name")
 
-    if not (source_account and source_password and source_name):
+    if not (source_account and source_name):
         print("월급 지급 실패: 공용계좌가 설정되지 않았습니다.")
         return
 
-    if not verify_public_account(source_account, source_password):
+    if not verify_salary_source(source_info):
         print("월급 지급 실패: 공용계좌 인증 실패")
         return
 
@@ -1148,53 +1677,71 @@ def pay_monthly_salaries_to_members() -> None:
 
     total_needed = 0
     recipients: List[Tuple[str, int, List[str]]] = []
+    account_by_user = state.account_mapping.user_index
+
+    salary_by_member: Dict[int, int] = defaultdict(int)
+    roles_by_member: Dict[int, List[str]] = defaultdict(list)
 
+    salary_by_role_id = {int(role_id): salary for role_id, salary in salaries.items() if salary}
+
+    # Role.members rescans the whole member cache, so walk each guild's
+    # members once and match their roles against the salary table instead.
     for guild in bot.guilds:
         for member in guild.members:
             if member.bot:
                 continue
-            account_number = get_account_number_by_user(member.id)
-            if not account_number or account_number not in users:
-                continue
-            role_total = 0
-            role_names: List[str] = []
             for role in member.roles:
-                salary = salaries.get(str(role.id))
+                salary = salary_by_role_id.get(role.id)
                 if salary:
-                    role_total += salary
-                    role_names.append(role.name)
-            if role_total > 0:
-                total_needed += role_total
-                recipients.append((account_number, role_total, role_names))
-
-    source_record = AccountRecord.from_dict(source_account, users[source_account])
-    if source_record.balance < total_needed:
+                    salary_by_member[member.id] += salary
+                    roles_by_member[member.id].append(role.name)
+
+    for user_id, role_total in salary_by_member.items():
+        account_number = account_by_user.get(user_id)
+        if not account_number or account_number not in users:
+            continue
+        total_needed += role_total
+        recipients.append((account_number, role_total, roles_by_member[user_id]))
+
+    source = users[source_account]
+    if source["잔액"] < total_needed:
         print(
             "월급 지급 실패: 공용계좌 잔액 부족 (필요: "
-            f"{format_number_4digit(total_needed)}원, 보유: {format_number_4digit(source_record.balance)}원)"
+            f"{format_won(total_needed)}, 보유: {format_won(source['잔액'])})"
         )
         return
 
+    payments: List[Dict[str, Any]] = []
     for account_number, amount, roles in recipients:
-        recipient_record = AccountRecord.from_dict(account_number, users[account_number])
-        source_record.balance -= amount
-        recipient_record.balance += amount
-        users[source_account] = source_record.to_dict()
-        users[account_number] = recipient_record.to_dict()
-        add_transaction(
-            "월급지급",
-            source_account,
-            account_number,
-            amount,
-            0,
-            f"월급 지급 ({', '.join(roles)}) - {source_name}",
+        source["잔액"] -= amount
+        users[account_number]["잔액"] += amount
+        payments.append(
+            build_transaction(
+                "월급지급",
+                source_account,
+                account_number,
+                amount,
+                0,
+                f"월급 지급 ({', '.join(roles)}) - {source_name}",
+            )
         )
-        print(f"월급 지급: {account_number} - {format_number_4digit(amount)}원")
+        print(f"월급 지급: {account_number} - {format_won(amount)}")
 
+    add_transactions(payments)
     save_users(users)
     settings["salary_system"]["last_paid"] = now.isoformat()
     save_settings(settings)
-    print(f"월급 일괄 지급 완료: 총 {format_number_4digit(total_needed)}원")
+    print(f"월급 일괄 지급 완료: 총 {format_won(total_needed)}")
+
+
+@tasks.loop(seconds=STORE_FLUSH_INTERVAL_SECONDS)
+async def flush_dirty_stores() -> None:
+    await state.flush_async()
+
+
+@tasks.loop(hours=TRANSACTION_LOG_COMPACTION_HOURS)
+async def compact_transaction_log() -> None:
+    await state.transactions.compact_async()
 
 
 @tasks.loop(hours=24)
@@ -1215,9 +1762,23 @@ async def pay_monthly_salaries() -> None:
 ###############################################################################
 
 
+@bot.event
+async def setup_hook() -> None:
+    # bot.run() does not handle SIGTERM, which is how docker and systemd stop
+    # the bot. Close the client instead so main() still flushes the stores.
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(bot.close()))
+    except NotImplementedError:  # pragma: no cover - not supported on Windows
+        pass
+
+
 @bot.event
 async def on_ready() -> None:
     print(f"{bot.user} 로그인 완료!")
+    if not flush_dirty_stores.is_running():
+        flush_dirty_stores.start()
+    if not compact_transaction_log.is_running():
+        compact_transaction_log.start()
     if not collect_taxes.is_running():
         collect_taxes.start()
         print("세금 징수 작업이 시작되었습니다.")
@@ -1237,7 +1798,13 @@ async def on_ready() -> None:
 
 
 def main() -> None:
-    bot.run(TOKEN)
+    migrate_legacy_accounts()
+    migrate_salary_source_password()
+    try:
+        bot.run(TOKEN)
+    finally:
+        state.flush()
+        state.users.close()
 
 
 if __name__ == "__main__":